@@ -14,6 +14,14 @@ import time
 import datetime
 from datetime import date
 import os
+import json
+import gzip
+import glob
+import queue
+import atexit
+import threading
+import uuid
+import zlib
 from google.colab import files
 from faker import Faker
 # Criar diretório para os dados se não existir
@@ -22,12 +30,124 @@ os.makedirs('/content/dados_simulados', exist_ok=True)
 SAAS_FILE = '/content/dados_simulados/saas_clientes.csv'
 PS8_FILE = '/content/dados_simulados/ps8_registros.csv'
 TOTEM_FILE = '/content/dados_simulados/totem_boletos.csv'
+# Diretório do log de eventos dos atendimentos (JSONL comprimido com gzip)
+EVENTOS_DIR = '/content/dados_simulados/eventos'
+# %% [markdown]
+# ## 🗂️ Classe para o Registro de Eventos
+#
+# Cada atendimento emite eventos estruturados (checklist, motivo, DCC, tempos de etapa,
+# registros PS8/TOTEM/SAAS). A gravação é feita por uma thread em segundo plano, em lotes,
+# para que o atendimento nunca espere pelo disco. Os arquivos são rotacionados por quantidade
+# de eventos e podem ser reprocessados com as funções de replay mais abaixo.
+# %%
+class RegistroEventos:
+    _FIM = object()
+
+    def __init__(self, diretorio=EVENTOS_DIR, max_eventos_por_arquivo=5000, tamanho_lote=200, intervalo_lote=2.0):
+        self.diretorio = diretorio
+        self.max_eventos_por_arquivo = max_eventos_por_arquivo
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_lote = intervalo_lote
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        self._fila = queue.Queue()
+        self._trava = threading.Lock()
+        self._arquivo = None
+        self._eventos_no_arquivo = 0
+        self._id_instancia = uuid.uuid4().hex[:8]
+        self._fechado = False
+        self._thread = threading.Thread(target=self._gravar_em_segundo_plano, daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def registrar_snapshot(self, saas, ps8, totem):
+        """Registra o estado atual dos sistemas como ponto de partida do replay"""
+        self.registrar(
+            'snapshot_sistemas', None,
+            saas=list(saas.clientes),
+            ps8=list(ps8.registros),
+            totem=list(totem.boletos)
+        )
+
+    def registrar(self, tipo, id_atendimento, **dados):
+        """Enfileira um evento sem bloquear o atendimento"""
+        with self._trava:
+            if self._fechado:
+                print(f"❌ Registro de eventos já encerrado. Evento '{tipo}' descartado.")
+                return
+            self._fila.put({
+                'ts': datetime.datetime.now().isoformat(timespec='milliseconds'),
+                'tipo': tipo,
+                'id_atendimento': id_atendimento,
+                **dados
+            })
+
+    def fechar(self):
+        """Grava os eventos pendentes e encerra a thread de gravação"""
+        with self._trava:
+            if self._fechado:
+                return
+            self._fechado = True
+            self._fila.put(self._FIM)
+        self._thread.join()
+        atexit.unregister(self.fechar)
+        print(f"💾 Eventos salvos em: {self.diretorio}")
+
+    def _novo_arquivo(self):
+        """Fecha o arquivo atual e abre o próximo da rotação"""
+        if self._arquivo:
+            self._arquivo.close()
+        # Carimbo com microssegundos + id da instância: a ordem alfabética segue a ordem de emissão
+        carimbo = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        caminho = os.path.join(self.diretorio, f"eventos_{carimbo}_{self._id_instancia}.jsonl.gz")
+        self._arquivo = gzip.open(caminho, 'ab')
+        self._eventos_no_arquivo = 0
+
+    def _gravar_lote(self, lote):
+        """Serializa e grava um lote de eventos, rotacionando o arquivo quando necessário"""
+        for evento in lote:
+            if self._arquivo is None or self._eventos_no_arquivo >= self.max_eventos_por_arquivo:
+                self._novo_arquivo()
+            self._arquivo.write((json.dumps(evento, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+            self._eventos_no_arquivo += 1
+        # Z_SYNC_FLUSH deixa o lote legível por carregar_eventos sem fechar o arquivo
+        self._arquivo.flush(zlib.Z_SYNC_FLUSH)
+
+    def _gravar_em_segundo_plano(self):
+        """Consome a fila e grava os eventos em lotes (por tamanho ou por intervalo de tempo)"""
+        encerrar = False
+        while not encerrar:
+            lote = []
+            item = self._fila.get()
+            limite = time.monotonic() + self.intervalo_lote
+            while True:
+                if item is self._FIM:
+                    encerrar = True
+                    break
+                lote.append(item)
+                restante = limite - time.monotonic()
+                if len(lote) >= self.tamanho_lote or restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+            if lote:
+                try:
+                    self._gravar_lote(lote)
+                except Exception as e:
+                    print(f"❌ Erro ao gravar eventos: {e}")
+        if self._arquivo:
+            self._arquivo.close()
+            self._arquivo = None
 # %% [markdown]
 # ## 🏢 Classe para Simulação do SAAS (Discador)
 # %%
 class SistemaSAAS:
-    def __init__(self, arquivo_saas=SAAS_FILE):
+    def __init__(self, arquivo_saas=SAAS_FILE, eventos=None):
         self.arquivo_saas = arquivo_saas
+        self.eventos = eventos
+        self.id_atendimento = None
         self.clientes = self.carregar_clientes()
 
     def carregar_clientes(self):
@@ -59,6 +179,8 @@ class SistemaSAAS:
         if not self.buscar_cliente_por_ban(cliente['ban']):
             self.clientes.append(cliente)
             self.salvar_clientes()
+            if self.eventos:
+                self.eventos.registrar('saas_cliente', self.id_atendimento, cliente=cliente)
             print(f"✅ Cliente {cliente['nome']} adicionado ao SAAS")
             return True
         else:
@@ -68,8 +190,10 @@ class SistemaSAAS:
 # ## 📋 Classe para Simulação do PS8 (Registro de Atendimentos)
 # %%
 class SistemaPS8:
-    def __init__(self, arquivo_ps8=PS8_FILE):
+    def __init__(self, arquivo_ps8=PS8_FILE, eventos=None):
         self.arquivo_ps8 = arquivo_ps8
+        self.eventos = eventos
+        self.id_atendimento = None
         self.registros = self.carregar_registros()
 
     def carregar_registros(self):
@@ -106,14 +230,18 @@ class SistemaPS8:
 
         self.registros.append(registro_completo)
         self.salvar_registros()
+        if self.eventos:
+            self.eventos.registrar('ps8_registro', self.id_atendimento, registro=registro_completo)
         print(f"✅ Registro PS8 adicionado: {registro_completo['resultado']}")
         return registro_completo
 # %% [markdown]
 # ## 🧾 Classe para Simulação do TOTEM (Geração de Boletos)
 # %%
 class SistemaTOTEM:
-    def __init__(self, arquivo_totem=TOTEM_FILE):
+    def __init__(self, arquivo_totem=TOTEM_FILE, eventos=None):
         self.arquivo_totem = arquivo_totem
+        self.eventos = eventos
+        self.id_atendimento = None
         self.boletos = self.carregar_boletos()
 
     def carregar_boletos(self):
@@ -157,6 +285,8 @@ class SistemaTOTEM:
 
         self.boletos.append(novo_boleto)
         self.salvar_boletos()
+        if self.eventos:
+            self.eventos.registrar('totem_boleto', self.id_atendimento, boleto=novo_boleto)
         print(f"✅ Boleto gerado: R$ {valor:.2f} - Vencimento: {novo_boleto['data_vencimento']}")
         return novo_boleto
 # %% [markdown]
@@ -285,12 +415,17 @@ class NegociacaoCliente:
 # ## 📞 Classe Principal de Atendimento (Adaptada)
 # %%
 class AtendimentoClaro:
-    def __init__(self, cliente):
+    def __init__(self, cliente, eventos=None):
         self.cliente = cliente
-        self.saas = SistemaSAAS()
-        self.ps8 = SistemaPS8()
-        self.totem = SistemaTOTEM()
+        self.eventos = eventos
+        self.id_atendimento = uuid.uuid4().hex
+        self.saas = SistemaSAAS(eventos=eventos)
+        self.ps8 = SistemaPS8(eventos=eventos)
+        self.totem = SistemaTOTEM(eventos=eventos)
+        for sistema in (self.saas, self.ps8, self.totem):
+            sistema.id_atendimento = self.id_atendimento
         self.checklist = Checklist()
+        self.registrar_evento('atendimento_iniciado', cliente=cliente)
 
         # Adicionar cliente ao SAAS se não existir
         if not self.saas.buscar_cliente_por_ban(cliente['ban']):
@@ -306,6 +441,14 @@ class AtendimentoClaro:
             self.saas.adicionar_cliente(cliente_saas)
 
         self.negociacao = NegociacaoCliente(cliente, self.ps8, self.totem)
+    def registrar_evento(self, tipo, **dados):
+        """Envia um evento ao log, se houver registro de eventos configurado"""
+        if self.eventos:
+            self.eventos.registrar(tipo, self.id_atendimento, **dados)
+    def marcar_item(self, numero_item):
+        """Marca item do checklist e registra o evento correspondente"""
+        self.checklist.marcar_concluido(numero_item)
+        self.registrar_evento('checklist_item', item=numero_item)
     def abertura_atendimento(self):
         """Etapa 1: Abertura e verificação inicial."""
         print("📞 ETAPA 1 - ABERTURA DO ATENDIMENTO")
@@ -314,7 +457,7 @@ class AtendimentoClaro:
         print("Para confirmar, poderia me informar seu nome completo ou CPF?")
 
         input("\nPressione Enter para simular a confirmação do cliente...")
-        self.checklist.marcar_concluido(1)
+        self.marcar_item(1)
 
         print("\n[FALA AO CLIENTE] Por favor, aguarde um momento enquanto consulto seus dados...")
         time.sleep(2)
@@ -333,18 +476,20 @@ class AtendimentoClaro:
         print(f"referente às {len(self.cliente['faturas'])} faturas em atraso,")
         print(f"totalizando R$ {self.negociacao.valor_total_divida:.2f}.")
 
-        self.checklist.marcar_concluido(2)
+        self.marcar_item(2)
 
         motivo = input("\n[AÇÃO] Motivo do atraso (digite breve descrição): ")
-        self.checklist.marcar_concluido(7)
+        self.registrar_evento('motivo_informado', motivo=motivo)
+        self.marcar_item(7)
 
         print("[FALA AO CLIENTE] Entendo sua situação. Vamos encontrar a melhor solução.")
 
         # Iniciar negociação
         resultado = self.negociacao.iniciar_negociacao()
-        self.checklist.marcar_concluido(3)
-        self.checklist.marcar_concluido(4)
-        self.checklist.marcar_concluido(9)
+        self.registrar_evento('negociacao_resultado', resultado=resultado)
+        self.marcar_item(3)
+        self.marcar_item(4)
+        self.marcar_item(9)
 
         return resultado
     def oferecer_dcc(self):
@@ -358,11 +503,12 @@ class AtendimentoClaro:
         print("Gostaria de conhecer melhor essa opção?")
 
         resposta = input("\n[AÇÃO] Cliente interessado? (s/n): ").lower()
+        self.registrar_evento('dcc_oferta', aceito=resposta == 's')
 
         if resposta == 's':
             print("\n[FALA AO CLIENTE] Excelente! O débito automático é seguro")
             print("e evita esquecimentos. Posso enviar mais informações?")
-            self.checklist.marcar_concluido(5)
+            self.marcar_item(5)
         else:
             print("\n[FALA AO CLIENTE] Sem problemas. Continuando com nosso atendimento...")
     def encerrar_atendimento(self):
@@ -374,11 +520,11 @@ class AtendimentoClaro:
         print("\n[FALA AO CLIENTE] Para evitar bloqueios e negativação do seu CPF,")
         print("recomendo que regularize sua situação o mais breve possível.")
 
-        self.checklist.marcar_concluido(8)
+        self.marcar_item(8)
 
         duvidas = input("\n[AÇÃO] Cliente tem dúvidas? (s/n): ").lower()
         if duvidas == 'n':
-            self.checklist.marcar_concluido(10)
+            self.marcar_item(10)
 
         print("\n[FALA AO CLIENTE] Obrigada pelo contato. Tenha um ótimo dia!")
         print("Qualquer dúvida, estamos à disposição.")
@@ -404,12 +550,20 @@ class AtendimentoClaro:
         print("✅ Registro PS8 concluído")
     def executar_atendimento(self):
         """Executa o fluxo completo do atendimento"""
+        inicio = time.perf_counter()
+        # Se nada mudar o status, o fluxo foi interrompido (ex.: KeyboardInterrupt em um input)
+        status = 'interrompido'
+        etapa_atual = None
+        erro = None
         try:
-            self.abertura_atendimento()
-            self.iniciar_negociacao()
-            self.oferecer_dcc()
-            self.encerrar_atendimento()
-            self.registrar_ps8()
+            for etapa in (self.abertura_atendimento, self.iniciar_negociacao, self.oferecer_dcc,
+                          self.encerrar_atendimento, self.registrar_ps8):
+                etapa_atual = etapa.__name__
+                inicio_etapa = time.perf_counter()
+                etapa()
+                self.registrar_evento('etapa_concluida', etapa=etapa_atual,
+                                      duracao_s=round(time.perf_counter() - inicio_etapa, 3))
+            etapa_atual = None
 
             # Mostrar checklist final
             print("\n" + "="*50)
@@ -419,9 +573,22 @@ class AtendimentoClaro:
 
             print("\n🎉 ATENDIMENTO CONCLUÍDO COM SUCESSO!")
             print("💾 Dados salvos nos sistemas SAAS, PS8 e TOTEM")
+            status = 'concluido'
 
         except Exception as e:
             print(f"❌ Erro durante o atendimento: {e}")
+            status = 'erro'
+            erro = str(e)
+
+        finally:
+            self.registrar_evento(
+                'atendimento_finalizado',
+                status=status,
+                etapa_falha=etapa_atual,
+                erro=erro,
+                duracao_s=round(time.perf_counter() - inicio, 3),
+                checklist={num: item['concluido'] for num, item in self.checklist.itens.items()}
+            )
 # %% [markdown]
 # ## 📋 Funções Auxiliares
 # %%
@@ -444,11 +611,15 @@ def parse_faturas(faturas_input):
                 except ValueError:
                     print(f"⚠️ Valor inválido: {valor_str}")
     return faturas
-def carregar_dados_exemplo():
+def carregar_dados_exemplo(eventos=None):
     """Carrega dados de exemplo se os arquivos estiverem vazios"""
-    saas = SistemaSAAS()
-    ps8 = SistemaPS8()
-    totem = SistemaTOTEM()
+    saas = SistemaSAAS(eventos=eventos)
+    ps8 = SistemaPS8(eventos=eventos)
+    totem = SistemaTOTEM(eventos=eventos)
+
+    # Estado inicial dos CSVs como base do replay; os exemplos abaixo entram como gravações
+    if eventos:
+        eventos.registrar_snapshot(saas, ps8, totem)
 
     # Adicionar exemplo se não houver dados
     if not saas.clientes:
@@ -477,10 +648,111 @@ def carregar_dados_exemplo():
     if not totem.boletos:
         totem.gerar_boleto('100000001', 150.0)
 # %% [markdown]
+# ## 🔁 Replay do Log de Eventos
+#
+# Lê os arquivos de eventos em ordem e reconstrói o estado dos sistemas SAAS/PS8/TOTEM
+# ou monta uma base por atendimento para alimentar o treino do classificador.
+# O estado reconstruído parte do último `snapshot_sistemas` (emitido uma vez por sessão, em
+# `carregar_dados_exemplo`) e aplica as gravações registradas depois dele.
+# %%
+def carregar_eventos(diretorio=EVENTOS_DIR):
+    """Percorre todos os eventos gravados, na ordem em que foram emitidos"""
+    for caminho in sorted(glob.glob(os.path.join(diretorio, 'eventos_*.jsonl.gz'))):
+        try:
+            with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    if linha.strip():
+                        yield json.loads(linha)
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            # Arquivo ainda aberto pelo writer ou truncado (sessão interrompida): mantém o que foi lido
+            print(f"⚠️ Arquivo de eventos incompleto ou em gravação: {caminho} ({e})")
+def reconstruir_sistemas(diretorio=EVENTOS_DIR):
+    """Reconstrói os DataFrames de SAAS, PS8 e TOTEM a partir do log de eventos"""
+    saas, ps8, totem = {}, [], []
+    for evento in carregar_eventos(diretorio):
+        if evento['tipo'] == 'snapshot_sistemas':
+            saas = {str(cliente['ban']): cliente for cliente in evento['saas']}
+            ps8 = list(evento['ps8'])
+            totem = list(evento['totem'])
+        elif evento['tipo'] == 'saas_cliente':
+            saas.setdefault(str(evento['cliente']['ban']), evento['cliente'])
+        elif evento['tipo'] == 'ps8_registro':
+            ps8.append(evento['registro'])
+        elif evento['tipo'] == 'totem_boleto':
+            totem.append(evento['boleto'])
+    return {
+        'saas': pd.DataFrame(list(saas.values())),
+        'ps8': pd.DataFrame(ps8),
+        'totem': pd.DataFrame(totem)
+    }
+# Colunas de dados_chamados.csv, para concatenar a base do simulador com o dataset existente
+COLUNAS_CHAMADOS = [
+    'id_chamado', 'cliente', 'cpf_cnpj', 'tipo_cliente', 'estado', 'canal_contato',
+    'tentativas_contato', 'dias_atraso', 'valor_total_divida', 'historico_pagamento',
+    'urgencia', 'texto'
+]
+def calcular_dias_atraso(faturas, data_referencia):
+    """Dias de atraso da fatura mais antiga (vencimento no formato DD/MM/AAAA)"""
+    dias = []
+    for fatura in faturas:
+        try:
+            vencimento = datetime.datetime.strptime(fatura['vencimento'], "%d/%m/%Y").date()
+        except (KeyError, ValueError):
+            continue
+        dias.append(max((data_referencia - vencimento).days, 0))
+    return max(dias) if dias else np.nan
+def gerar_base_treinamento(diretorio=EVENTOS_DIR):
+    """
+    Monta uma linha por atendimento no formato de dados_chamados.csv.
+    Mapeamento: id_chamado = id_atendimento, cliente = nome, cpf_cnpj = cpf, texto = motivo
+    informado, dias_atraso = atraso da fatura mais antiga, valor_total_divida = soma das faturas.
+    A urgência segue as regras de create_data.py; estado, tentativas_contato e
+    historico_pagamento não existem no simulador e ficam vazios.
+    Colunas extras do atendimento: resultado, dcc_aceito, itens_concluidos, status, duracao_total_s.
+    """
+    atendimentos = {}
+    for evento in carregar_eventos(diretorio):
+        if evento['id_atendimento'] is None:
+            continue
+        linha = atendimentos.setdefault(evento['id_atendimento'], {'id_chamado': evento['id_atendimento']})
+        tipo = evento['tipo']
+        if tipo == 'atendimento_iniciado':
+            cliente = evento['cliente']
+            faturas = cliente.get('faturas', [])
+            data_inicio = datetime.datetime.fromisoformat(evento['ts']).date()
+            linha['cliente'] = cliente.get('nome')
+            linha['cpf_cnpj'] = cliente.get('cpf')
+            linha['tipo_cliente'] = 'PJ' if '/' in str(cliente.get('cpf', '')) else 'PF'
+            linha['canal_contato'] = 'telefone'
+            linha['dias_atraso'] = calcular_dias_atraso(faturas, data_inicio)
+            linha['valor_total_divida'] = round(sum(fatura['valor'] for fatura in faturas), 2)
+        elif tipo == 'motivo_informado':
+            linha['texto'] = evento['motivo']
+        elif tipo == 'negociacao_resultado':
+            linha['resultado'] = evento['resultado'].get('resultado')
+        elif tipo == 'dcc_oferta':
+            linha['dcc_aceito'] = evento['aceito']
+        elif tipo == 'atendimento_finalizado':
+            linha['status'] = evento['status']
+            linha['duracao_total_s'] = evento['duracao_s']
+            linha['itens_concluidos'] = sum(evento['checklist'].values())
+
+    df = pd.DataFrame(list(atendimentos.values()))
+    extras = ['resultado', 'dcc_aceito', 'itens_concluidos', 'status', 'duracao_total_s']
+    df = df.reindex(columns=COLUNAS_CHAMADOS + extras)
+    # Mesmas regras de urgência de create_data.py (sem histórico de pagamento)
+    df['urgencia'] = np.select(
+        [df['dias_atraso'] > 90, (df['dias_atraso'] > 30) | (df['valor_total_divida'] > 250)],
+        ['Alta', 'Média'],
+        default='Baixa'
+    )
+    return df
+# %% [markdown]
 # ## 🚀 Execução Principal do Simulador
 # %%
-# Carregar dados de exemplo se necessário
-carregar_dados_exemplo()
+# Iniciar o log de eventos e carregar dados de exemplo se necessário
+eventos = RegistroEventos()
+carregar_dados_exemplo(eventos)
 print("🎯 SIMULADOR DE ATENDIMENTO - CLARO COBRANÇA")
 print("="*55)
 # Solicitar dados do cliente
@@ -520,8 +792,11 @@ cliente = {
 print("\n" + "="*55)
 print("🚀 INICIANDO ATENDIMENTO")
 print("="*55)
-atendimento = AtendimentoClaro(cliente)
-atendimento.executar_atendimento()
+atendimento = AtendimentoClaro(cliente, eventos=eventos)
+try:
+    atendimento.executar_atendimento()
+finally:
+    eventos.fechar()
 # %% [markdown]
 # ## 📊 Visualização dos Dados Gerados
 # %%
@@ -555,7 +830,7 @@ else:
 # %%
 # Download dos arquivos CSV
 def download_arquivos():
-    arquivos = [SAAS_FILE, PS8_FILE, TOTEM_FILE]
+    arquivos = [SAAS_FILE, PS8_FILE, TOTEM_FILE] + sorted(glob.glob(os.path.join(EVENTOS_DIR, '*.jsonl.gz')))
     for arquivo in arquivos:
         if os.path.exists(arquivo):
             files.download(arquivo)